@@ -1,14 +1,62 @@
+import base64
+import contextlib
+import cProfile
 import functools
+import hashlib
 import inspect
+import io
 import json
+import marshal
+import mmap
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import pstats
+import struct
 import tempfile
+import time
 import traceback
+import tracemalloc
+import uuid
 import zipfile
-from typing import Dict, Optional
+import zlib
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional
 
 import boto3
 import botocore
 
+try:
+    from awscrt import checksums as crt_checksums
+except ImportError:
+    crt_checksums = None
+
+
+ZIP_FLAG_ENCRYPTED = 0x1
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+SPOOL_MEMORY_FRACTION = 16
+PARALLEL_MAP_RESERVE_MS = 10000
+PARALLEL_MAP_RESERVE_FRACTION = 0.2
+PARALLEL_MAP_LOCATION_ENV_VAR = 'CODEPIPELINE_HELPER_CHECKPOINT_LOCATION'
+CONTINUATION_TOKEN_MAX_LENGTH = 2048
+OUTCOME_COMPLETED = 'completed'
+OUTCOME_CONTINUED = 'continued'
+OUTCOME_FAILED = 'failed'
+OUTCOME_ERROR = 'error'
+UPLOAD_CHECKSUM_ALGORITHM = 'SHA256'
+PROFILE_PARAM = '_profile'
+PROFILE_ENV_VAR = 'CODEPIPELINE_HELPER_PROFILE'
+PROFILE_DEFAULTS = {
+    'mode': 'cpu',
+    'top': 25,
+    'frames': 1,
+    'location': None,
+    'artifact': None,
+}
+PROFILE_MODES = ('cpu', 'memory')
+PROFILE_SWITCHES = ('1', 'true', 'yes', 'on')
+
 
 class ContinueLater(Exception):
     def __init__(self, *args, **kwargs):
@@ -16,6 +64,137 @@ class ContinueLater(Exception):
         super().__init__(*args)
 
 
+class IntegrityError(Exception):
+    pass
+
+
+class Crc32:
+    def __init__(self):
+        self.crc = 0
+
+    def update(self, data):
+        self.crc = zlib.crc32(data, self.crc)
+
+    def digest(self):
+        return self.crc.to_bytes(4, 'big')
+
+
+class CrtCrc:
+    def __init__(self, size, function_name):
+        self.size = size
+        self.function = getattr(crt_checksums, function_name)
+        self.crc = 0
+
+    def update(self, data):
+        self.crc = self.function(data, self.crc)
+
+    def digest(self):
+        return self.crc.to_bytes(self.size, 'big')
+
+
+class Checksum:
+    def __init__(self, hash_obj):
+        self.hash = hash_obj
+
+    def update(self, data):
+        self.hash.update(data)
+
+    def value(self):
+        return base64.b64encode(self.hash.digest()).decode()
+
+
+class ETag:
+    def __init__(self, part_size=None):
+        self.part_size = part_size
+        self.parts = [hashlib.md5()]
+        self.part_remaining = part_size
+
+    def update(self, data):
+        data = memoryview(data)
+        while self.part_size and len(data) > self.part_remaining:
+            self.parts[-1].update(data[:self.part_remaining])
+            data = data[self.part_remaining:]
+            self.parts.append(hashlib.md5())
+            self.part_remaining = self.part_size
+        self.parts[-1].update(data)
+        if self.part_size:
+            self.part_remaining -= len(data)
+
+    def value(self):
+        if not self.part_size:
+            return self.parts[0].hexdigest()
+
+        digests = b''.join(part.digest() for part in self.parts)
+
+        return '{}-{}'.format(hashlib.md5(digests).hexdigest(), len(self.parts))
+
+
+CHECKSUMS = {
+    'ChecksumSHA256': lambda: Checksum(hashlib.sha256()),
+    'ChecksumSHA1': lambda: Checksum(hashlib.sha1()),
+    'ChecksumCRC32': lambda: Checksum(Crc32()),
+    'ChecksumCRC32C': lambda: Checksum(CrtCrc(4, 'crc32c')),
+    'ChecksumCRC64NVME': lambda: Checksum(CrtCrc(8, 'crc64nvme')),
+}
+CRT_CHECKSUMS = ('ChecksumCRC32C', 'ChecksumCRC64NVME')
+
+
+class VerifyingWriter:
+    def __init__(self, file_obj, expected_size, checksum_name=None, checksum=None, expected_value=None):
+        self.file_obj = file_obj
+        self.size = 0
+        self.expected_size = expected_size
+        self.checksum_name = checksum_name
+        self.checksum = checksum
+        self.expected_value = expected_value
+
+    def write(self, data):
+        self.size += len(data)
+        if self.checksum:
+            self.checksum.update(data)
+
+        return self.file_obj.write(data)
+
+    def verify(self):
+        if self.size != self.expected_size:
+            raise IntegrityError('Expected {} bytes, received {}'.format(self.expected_size, self.size))
+
+        if self.checksum and self.checksum.value() != self.expected_value:
+            raise IntegrityError('{} mismatch: expected {}, computed {}'.format(
+                self.checksum_name, self.expected_value, self.checksum.value()))
+
+
+class SpooledFile:
+    def __init__(self, max_size=SPOOL_MAX_SIZE):
+        self.max_size = max_size
+        self.file = io.BytesIO()
+        self.rolled = False
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def write(self, data):
+        if not self.rolled and self.file.tell() + len(data) > self.max_size:
+            self.rollover()
+
+        return self.file.write(data)
+
+    def rollover(self):
+        file = tempfile.TemporaryFile()
+        file.write(self.file.getvalue())
+        file.seek(self.file.tell())
+        self.file = file
+        self.rolled = True
+
+    def getbuffer(self):
+        if not self.rolled:
+            return self.file.getbuffer()
+
+        self.file.flush()
+
+        return memoryview(mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
 class Job:
     def __init__(self, id, codepipeline=None):
         self.id = id
@@ -40,18 +219,19 @@ class Job:
 
 
 class Artifact:
-    def __init__(self, object_key, bucket_name, s3_client):
+    def __init__(self, object_key, bucket_name, s3_client, max_size=SPOOL_MAX_SIZE):
         self.s3 = s3_client
         self.object_key = object_key
         self.bucket_name = bucket_name
-        self.file_obj = tempfile.NamedTemporaryFile()
+        self.file_obj = SpooledFile(max_size)
+        self._archive = None
 
     def __getitem__(self, key):
         return self.archive.read(key)
 
     def __eq__(self, other):
         return all([
-            type(self) == type(other),
+            type(self) is type(other),
             self.bucket_name == other.bucket_name,
             self.object_key == other.object_key,
             self.s3 == other.s3,
@@ -69,26 +249,85 @@ class Artifact:
 
 
 class InputArtifact(Artifact):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._buffer = None
+
+    def view(self, key):
+        info = self.archive.getinfo(key)
+        if info.compress_type != zipfile.ZIP_STORED or info.flag_bits & ZIP_FLAG_ENCRYPTED:
+            return memoryview(self.archive.read(key))
+
+        start = member_data_offset(self.buffer, info)
+
+        return self.buffer[start:start + info.file_size]
+
     @property
-    @functools.lru_cache()
     def archive(self):
-        self.s3.download_fileobj(self.bucket_name, self.object_key, self.file_obj)
+        if self._archive is None:
+            writer = self.build_writer()
+            self.s3.download_fileobj(self.bucket_name, self.object_key, writer)
+            writer.verify()
+            self._archive = zipfile.ZipFile(self.file_obj)
+
+        return self._archive
+
+    def build_writer(self):
+        head = self.s3.head_object(Bucket=self.bucket_name, Key=self.object_key, ChecksumMode='ENABLED')
+        for checksum_name, checksum_cls in CHECKSUMS.items():
+            expected_value = head.get(checksum_name)
+            if checksum_name in CRT_CHECKSUMS and not crt_checksums:
+                continue
+            if expected_value and '-' not in expected_value:
+                return VerifyingWriter(self.file_obj, head['ContentLength'], checksum_name, checksum_cls(), expected_value)
+
+        expected_value = head.get('ETag', '').strip('"')
+        if not expected_value or head.get('ServerSideEncryption', 'AES256') != 'AES256' or head.get('SSECustomerAlgorithm'):
+            log('input_artifact_checksum_unavailable', **self.to_dict(),
+                unsupported=[name for name in CRT_CHECKSUMS if head.get(name)])
+            return VerifyingWriter(self.file_obj, head['ContentLength'])
+
+        part_size = None
+        if '-' in expected_value:
+            part_size = self.s3.head_object(Bucket=self.bucket_name, Key=self.object_key, PartNumber=1)['ContentLength']
+
+        return VerifyingWriter(self.file_obj, head['ContentLength'], 'ETag', ETag(part_size), expected_value)
+
+    @property
+    def buffer(self):
+        if self._buffer is None:
+            self.archive
+            self._buffer = self.file_obj.getbuffer()
 
-        return zipfile.ZipFile(self.file_obj.name)
+        return self._buffer
 
 
 class OutputArtifact(Artifact):
     @property
-    @functools.lru_cache()
     def archive(self):
-        return zipfile.ZipFile(self.file_obj.name, 'w')
+        if self._archive is None:
+            self._archive = zipfile.ZipFile(self.file_obj, 'w')
+
+        return self._archive
 
     def __setitem__(self, key, value):
         return self.archive.writestr(key, value)
 
     def publish(self):
         self.archive.close()
-        self.s3.upload_fileobj(self.file_obj, self.bucket_name, self.object_key)
+        self.file_obj.seek(0)
+        self.s3.upload_fileobj(self.file_obj, self.bucket_name, self.object_key,
+                               ExtraArgs={'ChecksumAlgorithm': UPLOAD_CHECKSUM_ALGORITHM})
+
+
+def member_data_offset(buffer, info):
+    header = struct.unpack(zipfile.structFileHeader,
+                           buffer[info.header_offset:info.header_offset + zipfile.sizeFileHeader])
+    if header[0] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile('Bad magic number for file header: {}'.format(info.filename))
+    name_length, extra_length = header[-2:]
+
+    return info.header_offset + zipfile.sizeFileHeader + name_length + extra_length
 
 
 Params = Dict[str, str]
@@ -114,10 +353,10 @@ def build_s3_client(credentials_dict):
     return client
 
 
-def parse_artifacts(artifacts_list, s3_client, artifact_cls):
+def parse_artifacts(artifacts_list, s3_client, artifact_cls, max_size=SPOOL_MAX_SIZE):
     for artifact_dict in artifacts_list:
         location = artifact_dict['location']['s3Location']
-        yield artifact_dict['name'], artifact_cls(location['objectKey'], location['bucketName'], s3_client)
+        yield artifact_dict['name'], artifact_cls(location['objectKey'], location['bucketName'], s3_client, max_size)
 
 
 def publish_artifacts(artifacts):
@@ -126,6 +365,205 @@ def publish_artifacts(artifacts):
     log('output_artifacts_published', artifacts={name: artifact.to_dict() for name, artifact in artifacts.items()})
 
 
+def parallel_map_worker(fn, conn):
+    for index, item in iter(conn.recv, None):
+        try:
+            conn.send((index, True, fn(item)))
+        except Exception as e:
+            conn.send((index, False, '{}: {}'.format(type(e).__name__, e)))
+
+
+def parse_s3_location(location: str):
+    bucket_name, _, prefix = location.replace('s3://', '', 1).partition('/')
+
+    return bucket_name, prefix.strip('/')
+
+
+def save_checkpoint(checkpoint: Dict, location: Optional[str]):
+    if not location:
+        return checkpoint
+
+    bucket_name, prefix = parse_s3_location(location)
+    object_key = '/'.join(part for part in (prefix, 'parallel_map', '{}.json'.format(uuid.uuid4())) if part)
+    boto3.client('s3').put_object(Bucket=bucket_name, Key=object_key, Body=json.dumps(checkpoint))
+
+    return 's3://{}/{}'.format(bucket_name, object_key)
+
+
+def load_checkpoint(checkpoint) -> Optional[Dict]:
+    if not isinstance(checkpoint, str):
+        return checkpoint
+
+    bucket_name, object_key = parse_s3_location(checkpoint)
+
+    return json.loads(boto3.client('s3').get_object(Bucket=bucket_name, Key=object_key)['Body'].read())
+
+
+def parallel_map(fn: Callable, items: Iterable, name=None, processes=None, context=None, token: Token = None,
+                 checkpoints: Optional[Dict] = None, location=None, reserve=PARALLEL_MAP_RESERVE_MS) -> List:
+    name = name or fn.__name__
+    items = list(items)
+    checkpoints = {} if checkpoints is None else checkpoints
+    if name in checkpoints:
+        raise ValueError('parallel_map {} already ran in this invocation, pass a unique name'.format(name))
+
+    checkpoint = load_checkpoint(((token or {}).get('parallel_map') or {}).get(name))
+    if checkpoint and checkpoint['size'] != len(items):
+        raise ValueError('parallel_map {} resumed with {} items instead of {}'.format(name, len(items), checkpoint['size']))
+    done = {int(index): result for index, result in checkpoint['results'].items()} if checkpoint else {}
+    checkpoints[name] = {'size': len(items), 'results': done}
+    pending = [index for index in range(len(items)) if index not in done]
+    if context and pending:
+        reserve = min(reserve, context.get_remaining_time_in_millis() * PARALLEL_MAP_RESERVE_FRACTION)
+
+    mp = multiprocessing.get_context('fork')
+    workers = {}
+    for _ in range(min(processes or os.cpu_count() or 1, len(pending))):
+        parent_conn, child_conn = mp.Pipe()
+        process = mp.Process(target=parallel_map_worker, args=(fn, child_conn), daemon=True)
+        process.start()
+        child_conn.close()
+        workers[parent_conn] = process
+
+    finished = 0
+    queue = ((index, items[index]) for index in pending)
+    busy = list(workers)
+    try:
+        for conn in busy:
+            conn.send(next(queue))
+
+        while len(done) < len(items):
+            timeout = None
+            if context and finished:
+                timeout = (context.get_remaining_time_in_millis() - reserve) / 1000
+                if timeout <= 0:
+                    log('parallel_map_checkpointed', name=name, finished=len(done), pending=len(items) - len(done))
+                    raise ContinueLater(parallel_map={
+                        checkpoint_name: save_checkpoint(checkpoint, location)
+                        for checkpoint_name, checkpoint in checkpoints.items()
+                    })
+
+            for conn in multiprocessing.connection.wait(busy, timeout):
+                index, succeeded, result = conn.recv()
+                if not succeeded:
+                    raise RuntimeError('parallel_map failed on item {}: {}'.format(index, result))
+                done[index] = result
+                finished += 1
+                task = next(queue, None)
+                conn.send(task)
+                if task is None:
+                    busy.remove(conn)
+    finally:
+        for conn, process in workers.items():
+            process.terminate()
+            process.join()
+            conn.close()
+
+    return [done[index] for index in range(len(items))]
+
+
+def spool_max_size(config: Dict, context) -> int:
+    if 'spool_max_size' in config:
+        return config['spool_max_size']
+
+    memory_limit_in_mb = getattr(context, 'memory_limit_in_mb', None)
+    if memory_limit_in_mb:
+        return int(memory_limit_in_mb) * 1024 * 1024 // SPOOL_MEMORY_FRACTION
+    else:
+        return SPOOL_MAX_SIZE
+
+
+def build_profile(value) -> Dict:
+    if isinstance(value, str):
+        if value.startswith('{'):
+            value = json.loads(value)
+        elif value.lower() not in PROFILE_SWITCHES:
+            value = {'mode': value}
+    if not isinstance(value, dict):
+        value = {}
+
+    unknown = set(value) - set(PROFILE_DEFAULTS)
+    if unknown:
+        raise ValueError('unknown options: {}'.format(', '.join(sorted(unknown))))
+
+    profile = dict(PROFILE_DEFAULTS, **value)
+    modes = profile['mode'].split(',') if isinstance(profile['mode'], str) else profile['mode']
+    if not modes or not set(modes) <= set(PROFILE_MODES):
+        raise ValueError('mode must be a combination of {}, got {!r}'.format(', '.join(PROFILE_MODES), profile['mode']))
+    profile['mode'] = list(modes)
+    if not isinstance(profile['top'], int) or profile['top'] < 1:
+        raise ValueError('top must be a positive integer, got {!r}'.format(profile['top']))
+    if not isinstance(profile['frames'], int) or profile['frames'] < 1:
+        raise ValueError('frames must be a positive integer, got {!r}'.format(profile['frames']))
+
+    return profile
+
+
+def parse_profile(config: Dict, params: Params) -> Optional[Dict]:
+    value = params.pop(PROFILE_PARAM, None) if isinstance(params, dict) else None
+    value = value or os.environ.get(PROFILE_ENV_VAR) or config.get('profile')
+    if not value:
+        return None
+
+    try:
+        profile = build_profile(value)
+    except (TypeError, ValueError) as e:
+        log('profile_ignored', profile=repr(value), message=str(e))
+        return None
+
+    return profile
+
+
+def save_profile(dumps: Dict[str, bytes], profile: Dict, job_id, output_artifacts: OutputArtifacts):
+    for name, content in dumps.items():
+        key = 'profile/{}/{}'.format(job_id, name)
+        if profile['artifact']:
+            output_artifacts[profile['artifact']][key] = content
+        if profile['location']:
+            bucket_name, prefix = parse_s3_location(profile['location'])
+            object_key = '/'.join(part for part in (prefix, key) if part)
+            boto3.client('s3').put_object(Bucket=bucket_name, Key=object_key, Body=content)
+            log('profile_saved', bucket_name=bucket_name, object_key=object_key)
+
+
+@contextlib.contextmanager
+def profiled(profile: Optional[Dict], job_id, output_artifacts: OutputArtifacts):
+    if not profile:
+        yield
+        return
+
+    modes = profile['mode']
+    profiler = cProfile.Profile() if 'cpu' in modes else None
+    tracing = 'memory' in modes and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start(profile['frames'])
+    if profiler:
+        profiler.enable()
+
+    try:
+        yield
+    finally:
+        dumps = {}
+        if profiler:
+            profiler.disable()
+            stream = io.StringIO()
+            stats = pstats.Stats(profiler, stream=stream)
+            stats.sort_stats('cumulative').print_stats(profile['top'])
+            log('profile_cpu', stats=stream.getvalue())
+            dumps['cpu.pstats'] = marshal.dumps(stats.stats)
+        if 'memory' in modes:
+            snapshot = tracemalloc.take_snapshot()
+            if tracing:
+                tracemalloc.stop()
+            log('profile_memory', stats=[str(stat) for stat in snapshot.statistics('lineno')[:profile['top']]])
+            dumps['memory.tracemalloc'] = pickle.dumps(snapshot)
+
+        try:
+            save_profile(dumps, profile, job_id, output_artifacts)
+        except Exception as e:
+            log('profile_save_failed', name=str(e), traceback=traceback.format_exc())
+
+
 def parse_params(configuration: Dict) -> Params:
     params_json = configuration.get('UserParameters')
     if params_json:
@@ -134,6 +572,18 @@ def parse_params(configuration: Dict) -> Params:
         return {}
 
 
+def validate_token(token: Dict) -> Optional[str]:
+    try:
+        token_json = json.dumps(token)
+    except (TypeError, ValueError) as e:
+        return 'Continuation token is not JSON-serializable: {}'.format(e)
+
+    if len(token_json) > CONTINUATION_TOKEN_MAX_LENGTH:
+        return 'Continuation token exceeds {} characters ({})'.format(CONTINUATION_TOKEN_MAX_LENGTH, len(token_json))
+
+    return None
+
+
 def parse_token(data: Dict) -> Token:
     token_json = data.get('continuationToken')
     if token_json:
@@ -157,40 +607,118 @@ def action(handler=None, **kwargs):
     def wrapper(event, context):
         job = event['CodePipeline.job']
         data = job['data']
-        job = Job(job['id'])
+        if wrapper.codepipeline is None:
+            wrapper.codepipeline = boto3.client('codepipeline')
+        job = Job(job['id'], wrapper.codepipeline)
         output_artifacts = []
 
         try:
             s3_client = build_s3_client(data['artifactCredentials'])
             token = parse_token(data)
-            input_artifacts = dict(parse_artifacts(data['inputArtifacts'], s3_client, InputArtifact))
-            output_artifacts = dict(parse_artifacts(data['outputArtifacts'], s3_client, OutputArtifact))
+            max_size = spool_max_size(config, context)
+            input_artifacts = dict(parse_artifacts(data['inputArtifacts'], s3_client, InputArtifact, max_size))
+            output_artifacts = dict(parse_artifacts(data['outputArtifacts'], s3_client, OutputArtifact, max_size))
             params = parse_params(data['actionConfiguration']['configuration'])
+            profile = parse_profile(config, params)
             actual_handler = wrapper.on_continue_handler if token else handler
             available_kwargs = {
                 'input_artifacts': input_artifacts,
                 'output_artifacts': output_artifacts,
                 'params': params,
                 'token': token,
+                'parallel_map': functools.partial(
+                    parallel_map, context=context, token=token, checkpoints={},
+                    location=config.get('checkpoint_location') or os.environ.get(PARALLEL_MAP_LOCATION_ENV_VAR),
+                ),
             }
             handler_kwargs = {
                 kwarg_name: available_kwargs.get(kwarg_name)
                 for kwarg_name in inspect.signature(actual_handler).parameters
             }
 
-            actual_handler(**handler_kwargs)
+            with profiled(profile, job.id, output_artifacts):
+                actual_handler(**handler_kwargs)
         except ContinueLater as e:
+            token_error = validate_token(e.token)
+            if token_error:
+                log('invalid_continuation_token', message=token_error)
+                job.fail(token_error)
+                return OUTCOME_FAILED
+
             publish_artifacts(output_artifacts)
             job.continue_later(e.token)
+            return OUTCOME_CONTINUED
+        except IntegrityError as e:
+            log('integrity_check_failed', message=str(e), traceback=traceback.format_exc())
+            job.fail('Artifact integrity check failed: {}'.format(e))
+            return OUTCOME_FAILED
         except Exception as e:
             log('exception_raised', name=str(e), traceback=traceback.format_exc())
             job.fail('Action failed due to exception: {}'.format(type(e).__name__))
+            return OUTCOME_FAILED
         else:
             publish_artifacts(output_artifacts)
             job.complete()
+            return OUTCOME_COMPLETED
 
+    wrapper.codepipeline = None
     wrapper.on_continue_handler = None
     wrapper.on_continue = on_continue
     functools.update_wrapper(wrapper, handler)
 
     return wrapper
+
+
+class Router:
+    def __init__(self, key='action'):
+        self.key = key
+        self.routes = {}
+        self.invocations = Counter()
+        self._codepipeline = None
+
+    @property
+    def codepipeline(self):
+        if self._codepipeline is None:
+            self._codepipeline = boto3.client('codepipeline')
+
+        return self._codepipeline
+
+    def route(self, name, handler=None, **kwargs):
+        if not handler:
+            return functools.partial(self.route, name, **kwargs)
+
+        if name in self.routes:
+            raise ValueError('Route {} is already registered'.format(name))
+
+        self.routes[name] = action(handler, **kwargs)
+
+        return self.routes[name]
+
+    def resolve(self, configuration: Dict) -> Optional[str]:
+        return configuration.get(self.key) or parse_params(configuration).get(self.key)
+
+    def __call__(self, event, context):
+        job = event['CodePipeline.job']
+        configuration = job['data']['actionConfiguration']['configuration']
+        try:
+            name = self.resolve(configuration)
+        except Exception as e:
+            log('exception_raised', name=str(e), traceback=traceback.format_exc())
+            Job(job['id'], self.codepipeline).fail('Action routing failed due to exception: {}'.format(type(e).__name__))
+            return OUTCOME_FAILED
+
+        if name not in self.routes:
+            log('route_not_found', route=name, routes=sorted(self.routes))
+            Job(job['id'], self.codepipeline).fail('Unknown action route: {}'.format(name))
+            return OUTCOME_FAILED
+
+        self.invocations[name] += 1
+        self.routes[name].codepipeline = self.codepipeline
+        outcome = OUTCOME_ERROR
+        started = time.perf_counter()
+        try:
+            outcome = self.routes[name](event, context)
+            return outcome
+        finally:
+            log('route_finished', route=name, outcome=outcome, invocations=self.invocations[name],
+                duration_s=time.perf_counter() - started)
@@ -4,5 +4,7 @@ setup(
     name='codepipeline-helper',
     author='Marcin Zaremba',
     py_modules=['codepipeline_helper'],
-    install_requires=['boto3'],
+    python_requires='>=3.8',
+    install_requires=['boto3>=1.36.0'],
+    extras_require={'crt': ['awscrt']},
 )
@@ -1,7 +1,13 @@
+import io
+import json
+import marshal
+import pickle
+import zipfile
 from unittest import mock
 
-from codepipeline_helper import (ContinueLater, InputArtifact, OutputArtifact,
-                                 action)
+from codepipeline_helper import (PROFILE_DEFAULTS, ContinueLater, InputArtifact,
+                                 IntegrityError, OutputArtifact, action,
+                                 parse_profile)
 
 import pytest
 
@@ -11,8 +17,9 @@ def test_run_handler(get_event, boto3, action_successful):
     decorated_handler = action(handler)
     event = get_event()
 
-    decorated_handler(event, None)
+    result = decorated_handler(event, None)
 
+    assert result == 'completed'
     assert handler.call_count == 1
     assert action_successful(event)
 
@@ -48,8 +55,9 @@ def test_call_continue_later(get_event, boto3, codepipeline, action_successful,
     decorated_handler = action(handler)
     event = get_event()
 
-    decorated_handler(event, None)
+    result = decorated_handler(event, None)
 
+    assert result == 'continued'
     assert action_successful(event)
     assert action_continuation_token() == token
 
@@ -59,12 +67,24 @@ def test_call_fail(get_event, boto3, action_failed, action_failure_message):
     decorated_handler = action(handler)
     event = get_event()
 
-    decorated_handler(event, None)
+    result = decorated_handler(event, None)
 
+    assert result == 'failed'
     assert action_failed(event)
     assert 'Action failed due to exception' in action_failure_message()
 
 
+def test_call_fail_on_integrity_error(get_event, boto3, action_failed, action_failure_message):
+    handler = mock.MagicMock(side_effect=IntegrityError('ETag mismatch'))
+    decorated_handler = action(handler)
+    event = get_event()
+
+    decorated_handler(event, None)
+
+    assert action_failed(event)
+    assert action_failure_message() == 'Artifact integrity check failed: ETag mismatch'
+
+
 @pytest.mark.parametrize('handler_kwarg_names,expected_handler_kwargs', [
     pytest.param([], {}, id='with_everything_empty'),
     pytest.param(['params'], {'params': {'param1': 'one', 'param2': 'two'}}, id='with_known_kwarg'),
@@ -72,9 +92,9 @@ def test_call_fail(get_event, boto3, action_failed, action_failure_message):
 ])
 def test_call_handler_with_specified_kwargs(get_event, boto3, monkeypatch,
                                             handler_kwarg_names, expected_handler_kwargs):
-    monkeypatch.setattr('inspect.signature', mock.MagicMock(
+    monkeypatch.setattr('codepipeline_helper.inspect', mock.Mock(signature=mock.MagicMock(
         return_value=mock.MagicMock(parameters=handler_kwarg_names)
-    ))
+    )))
     handler = mock.MagicMock()
     decorated_handler = action(handler)
     event = get_event(params={'param1': 'one', 'param2': 'two'})
@@ -85,9 +105,9 @@ def test_call_handler_with_specified_kwargs(get_event, boto3, monkeypatch,
 
 
 def test_call_handler_with_parsed_artifacts(get_event, boto3, monkeypatch, s3):
-    monkeypatch.setattr('inspect.signature', mock.MagicMock(
+    monkeypatch.setattr('codepipeline_helper.inspect', mock.Mock(signature=mock.MagicMock(
         return_value=mock.MagicMock(parameters=['input_artifacts', 'output_artifacts'])
-    ))
+    )))
     handler = mock.MagicMock()
     decorated_handler = action(handler)
     input_artifacts = {
@@ -103,3 +123,124 @@ def test_call_handler_with_parsed_artifacts(get_event, boto3, monkeypatch, s3):
     decorated_handler(event, None)
 
     handler.assert_called_with(input_artifacts=input_artifacts, output_artifacts=output_artifacts)
+
+
+def test_call_handler_with_parallel_map(get_event, boto3, action_continuation_token):
+    def handler(parallel_map):
+        parallel_map(abs, [-1, -2], processes=1)
+
+    context = mock.Mock(memory_limit_in_mb='128')
+    context.get_remaining_time_in_millis.return_value = 0
+    decorated_handler = action(handler)
+    event = get_event()
+
+    decorated_handler(event, context)
+
+    assert action_continuation_token() == {'parallel_map': {'abs': {'size': 2, 'results': {'0': 1}}}}
+
+
+def test_call_continue_later_with_too_large_token(get_event, boto3, action_failed, action_failure_message):
+    handler = mock.MagicMock(side_effect=ContinueLater(result='x' * 2048))
+    decorated_handler = action(handler)
+    event = get_event()
+
+    decorated_handler(event, None)
+
+    assert action_failed(event)
+    assert 'Continuation token exceeds 2048 characters' in action_failure_message()
+
+
+@pytest.mark.parametrize('profile,expected_names', [
+    pytest.param({'artifact': 'Profile'}, ['cpu.pstats'], id='with_cpu'),
+    pytest.param({'artifact': 'Profile', 'mode': 'memory', 'top': 5}, ['memory.tracemalloc'], id='with_memory'),
+    pytest.param({'artifact': 'Profile', 'mode': 'cpu,memory'}, ['cpu.pstats', 'memory.tracemalloc'], id='with_both'),
+])
+def test_profile_handler_to_output_artifact(get_event, boto3, s3, action_successful, profile, expected_names):
+    def handler(params, output_artifacts):
+        assert params == {'param1': 'one'}
+
+    output_artifact = OutputArtifact(bucket_name='bucket_name', object_key='profile', s3_client=s3)
+    decorated_handler = action(handler)
+    event = get_event(params={'param1': 'one', '_profile': profile}, output_artifacts={'Profile': output_artifact})
+    job_id = event['CodePipeline.job']['id']
+    uploaded = {}
+    s3.upload_fileobj.side_effect = lambda file_obj, bucket_name, object_key, ExtraArgs: uploaded.update({object_key: file_obj.read()})
+
+    decorated_handler(event, None)
+
+    assert action_successful(event)
+    archive = zipfile.ZipFile(io.BytesIO(uploaded['profile']))
+    assert sorted(archive.namelist()) == ['profile/{}/{}'.format(job_id, name) for name in expected_names]
+    if 'cpu.pstats' in expected_names:
+        assert marshal.loads(archive.read('profile/{}/cpu.pstats'.format(job_id)))
+    if 'memory.tracemalloc' in expected_names:
+        assert pickle.loads(archive.read('profile/{}/memory.tracemalloc'.format(job_id)))
+
+
+def test_profile_handler_to_s3_location(get_event, boto3, s3, monkeypatch, action_failed):
+    monkeypatch.setenv('CODEPIPELINE_HELPER_PROFILE', '{"location": "s3://profiles/prefix/"}')
+    decorated_handler = action(mock.MagicMock(side_effect=Exception))
+    event = get_event()
+
+    decorated_handler(event, None)
+
+    assert action_failed(event)
+    _, kwargs = s3.put_object.call_args
+    assert kwargs['Bucket'] == 'profiles'
+    assert kwargs['Key'] == 'prefix/profile/{}/cpu.pstats'.format(event['CodePipeline.job']['id'])
+
+
+@pytest.mark.parametrize('params', [
+    pytest.param(42, id='with_number'),
+    pytest.param(['a'], id='with_list'),
+    pytest.param('name', id='with_string'),
+])
+def test_profile_handler_with_non_object_params(get_event, boto3, s3, monkeypatch, action_successful, params):
+    monkeypatch.setattr('codepipeline_helper.inspect', mock.Mock(signature=mock.MagicMock(
+        return_value=mock.MagicMock(parameters=['params'])
+    )))
+    handler = mock.MagicMock()
+    decorated_handler = action(handler, profile={'location': 's3://profiles'})
+    event = get_event(params=params)
+
+    decorated_handler(event, None)
+
+    handler.assert_called_with(params=params)
+    assert action_successful(event)
+    assert s3.put_object.call_count == 1
+
+
+@pytest.mark.parametrize('value,expected_profile', [
+    pytest.param(True, {}, id='with_true'),
+    pytest.param('true', {}, id='with_true_string'),
+    pytest.param('memory', {'mode': ['memory']}, id='with_mode'),
+    pytest.param({'mode': 'cpu,memory', 'top': 5}, {'mode': ['cpu', 'memory'], 'top': 5}, id='with_mapping'),
+    pytest.param('{"frames": 3}', {'frames': 3}, id='with_json'),
+])
+def test_parse_profile(value, expected_profile):
+    expected_profile = dict(dict(PROFILE_DEFAULTS, mode=['cpu']), **expected_profile)
+
+    profile = parse_profile({}, {'_profile': value})
+
+    assert profile == expected_profile
+
+
+@pytest.mark.parametrize('value', [
+    pytest.param('1,2', id='with_unknown_mode'),
+    pytest.param({'mode': []}, id='with_no_mode'),
+    pytest.param('{"mode": ', id='with_invalid_json'),
+    pytest.param({'top': 0}, id='with_invalid_top'),
+    pytest.param({'frames': 0}, id='with_invalid_frames'),
+    pytest.param({'depth': 3}, id='with_unknown_option'),
+])
+def test_ignore_invalid_profile(get_event, boto3, monkeypatch, action_successful, value):
+    monkeypatch.setenv('CODEPIPELINE_HELPER_PROFILE', value if isinstance(value, str) else json.dumps(value))
+    handler = mock.MagicMock()
+    decorated_handler = action(handler)
+    event = get_event()
+
+    decorated_handler(event, None)
+
+    assert parse_profile({}, {}) is None
+    assert handler.call_count == 1
+    assert action_successful(event)
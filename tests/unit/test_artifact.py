@@ -0,0 +1,249 @@
+import base64
+import hashlib
+import gc
+import io
+import zipfile
+import weakref
+import zlib
+from unittest import mock
+
+from codepipeline_helper import (CHECKSUMS, SPOOL_MAX_SIZE, InputArtifact,
+                                 IntegrityError, OutputArtifact, SpooledFile,
+                                 crt_checksums, spool_max_size)
+
+import pytest
+
+
+PART_SIZE = 100
+
+
+def default_head(content):
+    return {'ContentLength': len(content)}
+
+
+def build_archive(members, compression):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=compression) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def input_artifact(s3):
+    def _input_artifact(members, compression=zipfile.ZIP_STORED, max_size=SPOOL_MAX_SIZE, head=None):
+        content = build_archive(members, compression)
+        s3.download_fileobj.side_effect = lambda bucket_name, object_key, file_obj: file_obj.write(content)
+        s3.head_object.side_effect = lambda Bucket, Key, PartNumber=None, **kwargs: (
+            {'ContentLength': PART_SIZE} if PartNumber else (head or default_head)(content)
+        )
+
+        return InputArtifact(bucket_name='bucket_name', object_key='input', s3_client=s3, max_size=max_size)
+
+    return _input_artifact
+
+
+@pytest.mark.parametrize('max_size', [
+    pytest.param(SPOOL_MAX_SIZE, id='in_memory'),
+    pytest.param(1, id='spilled_to_disk'),
+])
+def test_view_stored_member_without_copy(input_artifact, max_size):
+    artifact = input_artifact({'first': b'one', 'second': b'two' * 1000}, max_size=max_size)
+
+    result = artifact.view('second')
+
+    assert isinstance(result, memoryview)
+    assert result == b'two' * 1000
+    assert artifact.view('first') == b'one'
+
+
+@pytest.mark.parametrize('compression', [
+    pytest.param(zipfile.ZIP_STORED, id='stored'),
+    pytest.param(zipfile.ZIP_DEFLATED, id='deflated'),
+])
+def test_read_member(input_artifact, compression):
+    artifact = input_artifact({'first': b'one' * 1000}, compression=compression)
+
+    result = artifact['first']
+
+    assert isinstance(result, bytes)
+    assert result == b'one' * 1000
+
+
+def test_view_deflated_member(input_artifact):
+    artifact = input_artifact({'first': b'one' * 1000}, compression=zipfile.ZIP_DEFLATED)
+
+    result = artifact.view('first')
+
+    assert isinstance(result, memoryview)
+    assert result == b'one' * 1000
+
+
+@pytest.mark.parametrize('read', [
+    pytest.param(lambda artifact, key: artifact[key], id='with_getitem'),
+    pytest.param(lambda artifact, key: artifact.view(key), id='with_view'),
+])
+def test_read_missing_member(input_artifact, read):
+    artifact = input_artifact({'first': b'one'})
+
+    with pytest.raises(KeyError):
+        read(artifact, 'missing')
+
+
+@pytest.mark.parametrize('max_size', [
+    pytest.param(SPOOL_MAX_SIZE, id='in_memory'),
+    pytest.param(1, id='spilled_to_disk'),
+])
+def test_publish_output_artifact(s3, max_size):
+    uploaded = {}
+    s3.upload_fileobj.side_effect = lambda file_obj, bucket_name, object_key, ExtraArgs: uploaded.update({object_key: file_obj.read()})
+    artifact = OutputArtifact(bucket_name='bucket_name', object_key='output', s3_client=s3, max_size=max_size)
+    artifact['first'] = 'one'
+
+    artifact.publish()
+
+    assert zipfile.ZipFile(io.BytesIO(uploaded['output'])).read('first') == b'one'
+
+
+@pytest.mark.parametrize('max_size,expected_rolled', [
+    pytest.param(SPOOL_MAX_SIZE, False, id='in_memory'),
+    pytest.param(4, True, id='spilled_to_disk'),
+])
+def test_spooled_file(max_size, expected_rolled):
+    file_obj = SpooledFile(max_size)
+
+    file_obj.write(b'one')
+    file_obj.write(b'two')
+    file_obj.seek(0)
+
+    assert file_obj.seekable()
+    assert file_obj.rolled == expected_rolled
+    assert file_obj.read() == b'onetwo'
+    assert file_obj.getbuffer() == b'onetwo'
+
+
+def test_release_read_artifact(input_artifact):
+    artifact = input_artifact({'first': b'one'})
+    artifact.view('first')
+    reference = weakref.ref(artifact)
+
+    del artifact
+    gc.collect()
+
+    assert reference() is None
+
+
+@pytest.mark.parametrize('config,context,expected_max_size', [
+    pytest.param({}, None, SPOOL_MAX_SIZE, id='with_default'),
+    pytest.param({'spool_max_size': 1024}, mock.Mock(memory_limit_in_mb='512'), 1024, id='with_config'),
+    pytest.param({}, mock.Mock(memory_limit_in_mb='512'), 32 * 1024 * 1024, id='with_context'),
+])
+def test_spool_max_size(config, context, expected_max_size):
+    assert spool_max_size(config, context) == expected_max_size
+
+
+requires_awscrt = pytest.mark.skipif(crt_checksums is None, reason='awscrt is not installed')
+
+
+def checksum(name, content):
+    result = CHECKSUMS[name]()
+    result.update(content)
+
+    return result.value()
+
+
+@pytest.mark.parametrize('name,expected_crc', [
+    pytest.param('ChecksumCRC32C', 0xe3069283, id='crc32c'),
+    pytest.param('ChecksumCRC64NVME', 0xae8b14860a799888, id='crc64nvme'),
+])
+def test_crt_crc_check_value(name, expected_crc):
+    pytest.importorskip('awscrt')
+    result = CHECKSUMS[name]()
+
+    result.update(b'1234')
+    result.update(memoryview(b'56789'))
+
+    assert result.hash.crc == expected_crc
+
+
+def multipart_etag(content, part_size):
+    parts = [hashlib.md5(content[offset:offset + part_size]).digest() for offset in range(0, len(content), part_size)]
+
+    return '"{}-{}"'.format(hashlib.md5(b''.join(parts)).hexdigest(), len(parts))
+
+
+@pytest.mark.parametrize('head', [
+    pytest.param(lambda content: {
+        'ContentLength': len(content),
+        'ChecksumSHA256': base64.b64encode(hashlib.sha256(content).digest()).decode(),
+    }, id='with_sha256'),
+    pytest.param(lambda content: {
+        'ContentLength': len(content),
+        'ChecksumCRC32': base64.b64encode(zlib.crc32(content).to_bytes(4, 'big')).decode(),
+    }, id='with_crc32'),
+    pytest.param(lambda content: {
+        'ContentLength': len(content),
+        'ChecksumCRC32C': checksum('ChecksumCRC32C', content),
+    }, id='with_crc32c', marks=requires_awscrt),
+    pytest.param(lambda content: {
+        'ContentLength': len(content),
+        'ChecksumCRC64NVME': checksum('ChecksumCRC64NVME', content),
+        'ServerSideEncryption': 'aws:kms',
+    }, id='with_crc64nvme', marks=requires_awscrt),
+    pytest.param(lambda content: {
+        'ContentLength': len(content),
+        'ETag': '"{}"'.format(hashlib.md5(content).hexdigest()),
+    }, id='with_etag'),
+    pytest.param(lambda content: {
+        'ContentLength': len(content),
+        'ETag': multipart_etag(content, PART_SIZE),
+    }, id='with_multipart_etag'),
+    pytest.param(lambda content: {
+        'ContentLength': len(content),
+        'ETag': '"not-md5"',
+        'ServerSideEncryption': 'aws:kms',
+    }, id='with_kms_etag'),
+])
+def test_verify_input_artifact(input_artifact, head):
+    artifact = input_artifact({'first': b'one' * 100}, head=head)
+
+    assert artifact['first'] == b'one' * 100
+
+
+def test_verify_size_only_without_awscrt(input_artifact, monkeypatch):
+    monkeypatch.setattr('codepipeline_helper.crt_checksums', None)
+    artifact = input_artifact({'first': b'one'}, head=lambda content: {
+        'ContentLength': len(content),
+        'ChecksumCRC64NVME': 'not-checked',
+        'ServerSideEncryption': 'aws:kms',
+    })
+
+    assert artifact['first'] == b'one'
+
+
+@pytest.mark.parametrize('head,message', [
+    pytest.param(lambda content: {'ContentLength': len(content) + 1}, 'Expected', id='when_truncated'),
+    pytest.param(lambda content: {
+        'ContentLength': len(content),
+        'ChecksumSHA256': base64.b64encode(hashlib.sha256(b'other').digest()).decode(),
+    }, 'ChecksumSHA256 mismatch', id='when_checksum_differs'),
+    pytest.param(lambda content: {
+        'ContentLength': len(content),
+        'ETag': '"{}"'.format(hashlib.md5(b'other').hexdigest()),
+    }, 'ETag mismatch', id='when_etag_differs'),
+])
+def test_fail_input_artifact_verification(input_artifact, head, message):
+    artifact = input_artifact({'first': b'one'}, head=head)
+
+    with pytest.raises(IntegrityError, match=message):
+        artifact['first']
+
+
+def test_publish_output_artifact_with_checksum(s3):
+    artifact = OutputArtifact(bucket_name='bucket_name', object_key='output', s3_client=s3)
+
+    artifact.publish()
+
+    _, kwargs = s3.upload_fileobj.call_args
+    assert kwargs['ExtraArgs'] == {'ChecksumAlgorithm': 'SHA256'}
@@ -0,0 +1,109 @@
+import io
+import itertools
+from unittest import mock
+
+from codepipeline_helper import ContinueLater, parallel_map
+
+import pytest
+
+
+def square(item):
+    return item * item
+
+
+def divide(item):
+    return 1 / item
+
+
+def expiring_context():
+    context = mock.Mock()
+    context.get_remaining_time_in_millis.side_effect = itertools.chain([60000], itertools.repeat(1000))
+
+    return context
+
+
+@pytest.mark.parametrize('processes', [1, 2, 8])
+def test_map_items(processes):
+    assert parallel_map(square, range(10), processes=processes) == [item * item for item in range(10)]
+
+
+def test_map_no_items():
+    assert parallel_map(square, []) == []
+
+
+def test_raise_on_failed_item():
+    with pytest.raises(RuntimeError, match='ZeroDivisionError'):
+        parallel_map(divide, [1, 0, 2], processes=2)
+
+
+def test_continue_later_when_running_out_of_time():
+    context = expiring_context()
+
+    with pytest.raises(ContinueLater) as e:
+        parallel_map(square, [1, 2, 3], processes=1, context=context)
+
+    assert e.value.token == {'parallel_map': {'square': {'size': 3, 'results': {0: 1}}}}
+
+
+def test_scale_reserve_to_remaining_time():
+    context = mock.Mock()
+    context.get_remaining_time_in_millis.return_value = 3000
+
+    assert parallel_map(square, [1, 2, 3], processes=1, context=context) == [1, 4, 9]
+
+
+def test_resume_from_token():
+    token = {'parallel_map': {'square': {'size': 4, 'results': {'0': 1, '1': 4}}}}
+
+    assert parallel_map(square, [1, 2, 3, 4], token=token) == [1, 4, 9, 16]
+
+
+def test_raise_on_resume_with_different_items():
+    token = {'parallel_map': {'square': {'size': 4, 'results': {'0': 1}}}}
+
+    with pytest.raises(ValueError, match='resumed with 3 items instead of 4'):
+        parallel_map(square, [1, 2, 3], token=token)
+
+
+def test_raise_on_repeated_name():
+    checkpoints = {}
+    parallel_map(square, [1], checkpoints=checkpoints)
+
+    with pytest.raises(ValueError, match='already ran'):
+        parallel_map(square, [2], checkpoints=checkpoints)
+
+    assert parallel_map(square, [2], name='second', checkpoints=checkpoints) == [4]
+
+
+def test_checkpoint_finished_maps():
+    context = expiring_context()
+    checkpoints = {}
+    parallel_map(square, [1], checkpoints=checkpoints)
+
+    with pytest.raises(ContinueLater) as e:
+        parallel_map(divide, [1, 2], processes=1, context=context, checkpoints=checkpoints)
+
+    assert e.value.token == {'parallel_map': {
+        'square': {'size': 1, 'results': {0: 1}},
+        'divide': {'size': 2, 'results': {0: 1.0}},
+    }}
+
+
+def test_checkpoint_to_s3_location(monkeypatch):
+    s3 = mock.MagicMock()
+    monkeypatch.setattr('codepipeline_helper.boto3.client', mock.Mock(return_value=s3))
+    context = expiring_context()
+
+    with pytest.raises(ContinueLater) as e:
+        parallel_map(square, [1, 2], processes=1, context=context, location='s3://checkpoints/prefix/')
+
+    location = e.value.token['parallel_map']['square']
+    _, kwargs = s3.put_object.call_args
+    assert location == 's3://checkpoints/{}'.format(kwargs['Key'])
+    assert kwargs['Bucket'] == 'checkpoints'
+    assert kwargs['Key'].startswith('prefix/parallel_map/')
+
+    s3.get_object.return_value = {'Body': io.BytesIO(kwargs['Body'].encode())}
+
+    assert parallel_map(square, [1, 2], token=e.value.token) == [1, 4]
+    s3.get_object.assert_called_with(Bucket='checkpoints', Key=kwargs['Key'])
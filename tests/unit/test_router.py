@@ -0,0 +1,119 @@
+import json
+from unittest import mock
+
+import codepipeline_helper
+from codepipeline_helper import ContinueLater, Router
+
+import pytest
+
+
+@pytest.fixture
+def router():
+    return Router()
+
+
+def test_register_route(router):
+    handler = mock.MagicMock()
+
+    decorated_handler = router.route('lint')(handler)
+
+    assert router.routes == {'lint': decorated_handler}
+    assert decorated_handler.__wrapped__ == handler
+
+
+@pytest.mark.parametrize('configuration', [
+    pytest.param({'UserParameters': '{"action": "lint"}'}, id='from_user_parameters'),
+    pytest.param({'action': 'lint'}, id='from_action_configuration'),
+])
+def test_run_routed_handler(get_event, boto3, action_successful, router, configuration):
+    lint_handler = mock.MagicMock()
+    minify_handler = mock.MagicMock()
+    router.route('lint')(lint_handler)
+    router.route('minify')(minify_handler)
+    event = get_event()
+    event['CodePipeline.job']['data']['actionConfiguration']['configuration'] = configuration
+
+    router(event, None)
+
+    assert lint_handler.call_count == 1
+    assert minify_handler.call_count == 0
+    assert router.invocations['lint'] == 1
+    assert action_successful(event)
+
+
+def test_run_routed_on_continue_handler(get_event, boto3, action_successful, router):
+    handler = mock.MagicMock()
+    on_continue_handler = mock.MagicMock()
+    router.route('lint')(handler).on_continue(on_continue_handler)
+    event = get_event(token={'sample': 'token'}, params={'action': 'lint'})
+
+    router(event, None)
+
+    assert handler.call_count == 0
+    assert on_continue_handler.call_count == 1
+    assert action_successful(event)
+
+
+def test_fail_unknown_route(get_event, boto3, action_failed, action_failure_message, router):
+    router.route('lint')(mock.MagicMock())
+    event = get_event(params={'action': 'minify'})
+
+    router(event, None)
+
+    assert action_failed(event)
+    assert 'Unknown action route: minify' in action_failure_message()
+
+
+@pytest.mark.parametrize('user_parameters,expected_exception', [
+    pytest.param('{"action": ', 'JSONDecodeError', id='with_invalid_json'),
+    pytest.param('["lint"]', 'AttributeError', id='with_non_object'),
+])
+def test_fail_unresolvable_route(get_event, boto3, action_failed, action_failure_message, router,
+                                 user_parameters, expected_exception):
+    router.route('lint')(mock.MagicMock())
+    event = get_event()
+    event['CodePipeline.job']['data']['actionConfiguration']['configuration'] = {'UserParameters': user_parameters}
+
+    router(event, None)
+
+    assert action_failed(event)
+    assert action_failure_message() == 'Action routing failed due to exception: {}'.format(expected_exception)
+
+
+def test_raise_on_duplicate_route(router):
+    router.route('lint')(mock.MagicMock())
+
+    with pytest.raises(ValueError, match='Route lint is already registered'):
+        router.route('lint')(mock.MagicMock())
+
+
+@pytest.mark.parametrize('side_effect,expected_outcome', [
+    pytest.param(None, 'completed', id='when_completed'),
+    pytest.param(ContinueLater(sample='token'), 'continued', id='when_continued'),
+    pytest.param(Exception, 'failed', id='when_failed'),
+])
+def test_log_route_outcome(get_event, boto3, capsys, router, side_effect, expected_outcome):
+    router.route('lint')(mock.MagicMock(side_effect=side_effect))
+    event = get_event(params={'action': 'lint'})
+
+    result = router(event, None)
+
+    logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    route_finished = next(entry for entry in logs if entry['event'] == 'route_finished')
+    assert result == expected_outcome
+    assert route_finished['route'] == 'lint'
+    assert route_finished['outcome'] == expected_outcome
+    assert route_finished['duration_s'] >= 0
+
+
+def test_share_codepipeline_client(get_event, boto3, router):
+    router.route('lint')(mock.MagicMock())
+    router.route('minify')(mock.MagicMock())
+
+    for route in ['lint', 'minify', 'lint', 'unknown']:
+        router(get_event(params={'action': route}), None)
+
+    codepipeline_calls = [
+        call for call in codepipeline_helper.boto3.Session.client.call_args_list if call[0][0] == 'codepipeline'
+    ]
+    assert len(codepipeline_calls) == 1